@@ -26,8 +26,12 @@ __all__ = ["ColumnDef", "IndexDef", "TableDef",
            "make_minimal_dia_object_schema", "make_minimal_dia_source_schema",
            "ApdbSchema"]
 
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
+import copy
+import functools
 import logging
+import os
+import types
 import yaml
 
 import sqlalchemy
@@ -40,6 +44,10 @@ import lsst.afw.table as afwTable
 
 _LOG = logging.getLogger(__name__.partition(".")[2])  # strip leading "lsst."
 
+# Use libyaml-based loader when PyYAML is built with it, it is significantly
+# faster than pure-Python implementation
+_YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 # Classes for representing schema
 
 # Column description:
@@ -66,6 +74,73 @@ IndexDef = namedtuple('IndexDef', 'name type columns')
 TableDef = namedtuple('TableDef', 'name description columns indices')
 
 
+@functools.lru_cache(maxsize=32)
+def _load_yaml_all(path, mtime):
+    """Parse all YAML documents in a file, caching the result.
+
+    Parameters
+    ----------
+    path : `str`
+        Name of the YAML file.
+    mtime : `int`
+        Modification time of the file in nanoseconds, only used as a part
+        of the cache key so that modified files are re-read.
+
+    Returns
+    -------
+    documents : `tuple`
+        Parsed YAML documents. Shared between callers, must not be modified.
+    """
+    _LOG.debug("Parsing YAML file %s", path)
+    with open(path) as yaml_stream:
+        return tuple(yaml.load_all(yaml_stream, Loader=_YamlLoader))
+
+
+def _read_yaml_all(path):
+    """Return list of all YAML documents in a file.
+
+    Parsed contents are cached, the list returned is a deep copy of cached
+    contents and can be modified by caller.
+
+    Parameters
+    ----------
+    path : `str`
+        Name of the YAML file.
+
+    Returns
+    -------
+    documents : `list`
+        Parsed YAML documents.
+    """
+    documents = _load_yaml_all(path, os.stat(path).st_mtime_ns)
+    return copy.deepcopy(list(documents))
+
+
+@functools.lru_cache(maxsize=32)
+def _load_column_map(path, mtime):
+    """Parse YAML file with column mappings, caching the result.
+
+    Parameters
+    ----------
+    path : `str`
+        Name of the YAML file.
+    mtime : `int`
+        Modification time of the file in nanoseconds, only used as a part
+        of the cache key so that modified files are re-read.
+
+    Returns
+    -------
+    column_map : `types.MappingProxyType`
+        Read-only mapping of table name to read-only mapping of cat column
+        name to afw column name.
+    """
+    _LOG.debug("Parsing column map file %s", path)
+    with open(path) as yaml_stream:
+        column_map = yaml.load(yaml_stream, Loader=_YamlLoader)
+    return types.MappingProxyType({table: types.MappingProxyType(cmap)
+                                   for table, cmap in column_map.items()})
+
+
 def make_minimal_dia_object_schema():
     """Define and create the minimal schema required for a DIAObject.
 
@@ -215,6 +290,9 @@ class ApdbSchema(object):
                              "CHAR": "String",
                              "BOOL": "Flag"}
 
+    # maximum number of cached afw schemas
+    _afwSchemaCacheSize = 64
+
     def __init__(self, engine, dia_object_index, dia_object_nightly,
                  schema_file, extra_schema_file=None, column_map=None,
                  afw_schemas=None, prefix=""):
@@ -235,10 +313,9 @@ class ApdbSchema(object):
 
         if column_map:
             _LOG.debug("Reading column map file %s", column_map)
-            with open(column_map) as yaml_stream:
-                # maps cat column name to afw column name
-                self._column_map = yaml.load(yaml_stream, Loader=yaml.SafeLoader)
-                _LOG.debug("column map: %s", self._column_map)
+            # maps cat column name to afw column name
+            self._column_map = _load_column_map(column_map, os.stat(column_map).st_mtime_ns)
+            _LOG.debug("column map: %s", self._column_map)
         else:
             _LOG.debug("No column map file is given, initialize to empty")
             self._column_map = {}
@@ -264,6 +341,9 @@ class ApdbSchema(object):
                               CHAR=sqlalchemy.types.CHAR,
                               BOOL=sqlalchemy.types.Boolean)
 
+        # cache for afw schemas, keyed by table name and set of columns
+        self._afwSchemaCache = OrderedDict()
+
         # generate schema for all tables, must be called last
         self._makeTables()
 
@@ -375,6 +455,42 @@ class ApdbSchema(object):
             Include only given table columns in schema, by default all columns
             are included.
 
+        Returns
+        -------
+        schema : `lsst.afw.table.Schema`
+        column_map : `dict`
+            Mapping of the table/result column names into schema key.
+        """
+        key = (table_name, frozenset(columns) if columns else None)
+        cached = self._afwSchemaCache.get(key)
+        if cached is None:
+            cached = self._makeAfwSchema(*key)
+            self._afwSchemaCache[key] = cached
+            # queries can use many different column sets, evict least
+            # recently used entries to limit cache size
+            while len(self._afwSchemaCache) > self._afwSchemaCacheSize:
+                self._afwSchemaCache.popitem(last=False)
+        else:
+            self._afwSchemaCache.move_to_end(key)
+        # return copies so that clients cannot modify cached instances,
+        # keys are still valid for a copy of the schema; schema copy shares
+        # alias map with original unless it is disconnected
+        schema, col2afw = cached
+        schema = afwTable.Schema(schema)
+        schema.disconnectAliases()
+        return schema, dict(col2afw)
+
+    def _makeAfwSchema(self, table_name, columns):
+        """Build afw schema for given table.
+
+        Parameters
+        ----------
+        table_name : `str`
+            One of known APDB table names.
+        columns : `frozenset` of `str` or `None`
+            Include only given table columns in schema, if `None` then all
+            columns are included.
+
         Returns
         -------
         schema : `lsst.afw.table.Schema`
@@ -495,17 +611,14 @@ class ApdbSchema(object):
         """
 
         _LOG.debug("Reading schema file %s", schema_file)
-        with open(schema_file) as yaml_stream:
-            tables = list(yaml.load_all(yaml_stream, Loader=yaml.SafeLoader))
-            # index it by table name
+        tables = _read_yaml_all(schema_file)
         _LOG.debug("Read %d tables from schema", len(tables))
 
         if extra_schema_file:
             _LOG.debug("Reading extra schema file %s", extra_schema_file)
-            with open(extra_schema_file) as yaml_stream:
-                extras = list(yaml.load_all(yaml_stream, Loader=yaml.SafeLoader))
-                # index it by table name
-                schemas_extra = {table['table']: table for table in extras}
+            extras = _read_yaml_all(extra_schema_file)
+            # index it by table name
+            schemas_extra = {table['table']: table for table in extras}
         else:
             schemas_extra = {}
 
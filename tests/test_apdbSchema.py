@@ -22,7 +22,10 @@
 """Unit test for ApdbSchema class.
 """
 
+import functools
 import os
+import shutil
+import tempfile
 import unittest
 
 import lsst.afw.table as afwTable
@@ -30,6 +33,7 @@ from lsst.dax.apdb import ApdbSchema, make_minimal_dia_object_schema, make_minim
 from lsst.utils import getPackageDir
 import lsst.utils.tests
 from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
 
 
 def _make_case_conficting_dia_object_schema():
@@ -46,10 +50,26 @@ def _make_case_conficting_dia_object_schema():
     return schema
 
 
+# afw schemas are not modified by tests, build them once
+_CASE_CONFLICT_SCHEMA = _make_case_conficting_dia_object_schema()
+_DIA_SRC_SCHEMA = make_minimal_dia_source_schema()
+
+
+@functools.lru_cache(maxsize=1)
+def _pkg_dir():
+    """Return location of dax_apdb package, result is cached.
+    """
+    return getPackageDir("dax_apdb")
+
+
 def _data_file_name(basename):
     """Return path name of a data file.
     """
-    return os.path.join(getPackageDir("dax_apdb"), "data", basename)
+    return os.path.join(_pkg_dir(), "data", basename)
+
+
+# Schema file used by all tests, same string is reused to help YAML caching
+_SCHEMA_FILE = _data_file_name("apdb-schema.yaml")
 
 
 class ApdbSchemaTestCase(unittest.TestCase):
@@ -58,7 +78,44 @@ class ApdbSchemaTestCase(unittest.TestCase):
 
     @classmethod
     def setUpClass(cls):
-        pass
+        # single in-memory database is shared by all tests, StaticPool keeps
+        # one connection open for all of them
+        cls.engine = create_engine('sqlite://', poolclass=StaticPool)
+        # baseline schema options, tests override some of them
+        cls._base_kwargs = dict(dia_object_index="baseline",
+                                dia_object_nightly=False,
+                                schema_file=_SCHEMA_FILE)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+
+    def setUp(self):
+        self._schemas = []
+
+    def tearDown(self):
+        # drop all tables created by the test
+        for schema in reversed(self._schemas):
+            schema.objects.metadata.drop_all(bind=self.engine)
+
+    def _makeApdbSchema(self, **kwargs):
+        """Make ApdbSchema instance using shared engine.
+
+        Parameters
+        ----------
+        **kwargs
+            Keyword arguments passed to `ApdbSchema` constructor, they
+            override baseline options.
+
+        Returns
+        -------
+        schema : `ApdbSchema`
+        """
+        schema_kwargs = self._base_kwargs.copy()
+        schema_kwargs.update(kwargs)
+        schema = ApdbSchema(engine=self.engine, **schema_kwargs)
+        self._schemas.append(schema)
+        return schema
 
     def _assertTable(self, table, name, ncol):
         """validation for tables schema.
@@ -81,13 +138,8 @@ class ApdbSchemaTestCase(unittest.TestCase):
         Schema is defined in YAML files, some checks here depend on that
         configuration and will need to be updated when configuration changes.
         """
-        engine = create_engine('sqlite://')
-
         # create standard (baseline) schema
-        schema = ApdbSchema(engine=engine,
-                            dia_object_index="baseline",
-                            dia_object_nightly=False,
-                            schema_file=_data_file_name("apdb-schema.yaml"))
+        schema = self._makeApdbSchema()
         schema.makeSchema()
         self._assertTable(schema.objects, "DiaObject", 92)
         self.assertEqual(len(schema.objects.primary_key), 2)
@@ -97,11 +149,7 @@ class ApdbSchemaTestCase(unittest.TestCase):
         self._assertTable(schema.forcedSources, "DiaForcedSource", 7)
 
         # create schema using prefix
-        schema = ApdbSchema(engine=engine,
-                            dia_object_index="baseline",
-                            dia_object_nightly=False,
-                            schema_file=_data_file_name("apdb-schema.yaml"),
-                            prefix="Pfx")
+        schema = self._makeApdbSchema(prefix="Pfx")
         # Drop existing tables (but we don't check it here)
         schema.makeSchema(drop=True)
         self._assertTable(schema.objects, "PfxDiaObject", 92)
@@ -111,11 +159,8 @@ class ApdbSchemaTestCase(unittest.TestCase):
         self._assertTable(schema.forcedSources, "PfxDiaForcedSource", 7)
 
         # use different indexing for DiaObject, need extra schema for that
-        schema = ApdbSchema(engine=engine,
-                            dia_object_index="pix_id_iov",
-                            dia_object_nightly=False,
-                            schema_file=_data_file_name("apdb-schema.yaml"),
-                            extra_schema_file=_data_file_name("apdb-schema-extra.yaml"))
+        schema = self._makeApdbSchema(dia_object_index="pix_id_iov",
+                                      extra_schema_file=_data_file_name("apdb-schema-extra.yaml"))
         schema.makeSchema(drop=True)
         self._assertTable(schema.objects, "DiaObject", 94)
         self.assertEqual(len(schema.objects.primary_key), 3)
@@ -125,11 +170,8 @@ class ApdbSchemaTestCase(unittest.TestCase):
         self._assertTable(schema.forcedSources, "DiaForcedSource", 7)
 
         # use DiaObjectLast table for DiaObject, need extra schema for that
-        schema = ApdbSchema(engine=engine,
-                            dia_object_index="last_object_table",
-                            dia_object_nightly=False,
-                            schema_file=_data_file_name("apdb-schema.yaml"),
-                            extra_schema_file=_data_file_name("apdb-schema-extra.yaml"))
+        schema = self._makeApdbSchema(dia_object_index="last_object_table",
+                                      extra_schema_file=_data_file_name("apdb-schema-extra.yaml"))
         schema.makeSchema(drop=True)
         self._assertTable(schema.objects, "DiaObject", 94)
         self.assertEqual(len(schema.objects.primary_key), 2)
@@ -140,10 +182,7 @@ class ApdbSchemaTestCase(unittest.TestCase):
         self._assertTable(schema.forcedSources, "DiaForcedSource", 7)
 
         # baseline schema with nightly DiaObject
-        schema = ApdbSchema(engine=engine,
-                            dia_object_index="baseline",
-                            dia_object_nightly=True,
-                            schema_file=_data_file_name("apdb-schema.yaml"))
+        schema = self._makeApdbSchema(dia_object_nightly=True)
         schema.makeSchema(drop=True)
         self._assertTable(schema.objects, "DiaObject", 92)
         self._assertTable(schema.objects_nightly, "DiaObjectNightly", 92)
@@ -151,6 +190,42 @@ class ApdbSchemaTestCase(unittest.TestCase):
         self._assertTable(schema.sources, "DiaSource", 108)
         self._assertTable(schema.forcedSources, "DiaForcedSource", 7)
 
+    def test_schemaFileCache(self):
+        """Test that cached schema file contents are not modified.
+
+        Extra columns from afw schemas are merged into parsed schema, this
+        should not affect other instances which use the same schema file.
+        """
+        afw_schemas = dict(DiaObject=make_minimal_dia_object_schema(),
+                           DiaSource=_DIA_SRC_SCHEMA)
+        schema = self._makeApdbSchema(column_map=_data_file_name("apdb-afw-map.yaml"),
+                                      afw_schemas=afw_schemas)
+        self._assertTable(schema.objects, "DiaObject", 94)
+
+        schema = self._makeApdbSchema()
+        self._assertTable(schema.objects, "DiaObject", 92)
+        self._assertTable(schema.sources, "DiaSource", 108)
+
+    def test_schemaFileModified(self):
+        """Test that modified schema file is re-read.
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            schema_file = os.path.join(tmpdir, "apdb-schema.yaml")
+            shutil.copy(_SCHEMA_FILE, schema_file)
+
+            schema = self._makeApdbSchema(schema_file=schema_file)
+            with self.assertRaises(KeyError):
+                schema.getColumnMap("ExtraTable")
+
+            with open(schema_file, "a") as stream:
+                stream.write("---\ntable: ExtraTable\ncolumns:\n- name: id\n  type: BIGINT\n")
+            # make sure that modification time changes
+            mtime = os.stat(schema_file).st_mtime_ns + 1000000000
+            os.utime(schema_file, ns=(mtime, mtime))
+
+            schema = self._makeApdbSchema(schema_file=schema_file)
+            self.assertEqual(len(schema.getColumnMap("ExtraTable")), 1)
+
     def test_afwSchemaCaseSensitivity(self):
         """Test for column case mismatch errors.
 
@@ -160,18 +235,12 @@ class ApdbSchemaTestCase(unittest.TestCase):
         Like all other tests this depends on the column naming in
         apdb-schema.yaml.
         """
-        engine = create_engine('sqlite://')
-
-        afw_schemas = dict(DiaObject=_make_case_conficting_dia_object_schema(),
-                           DiaSource=make_minimal_dia_source_schema())
+        afw_schemas = dict(DiaObject=_CASE_CONFLICT_SCHEMA,
+                           DiaSource=_DIA_SRC_SCHEMA)
         # column case mismatch should cause exception in constructor
         with self.assertRaises(ValueError):
-            ApdbSchema(engine=engine,
-                       dia_object_index="baseline",
-                       dia_object_nightly=False,
-                       schema_file=_data_file_name("apdb-schema.yaml"),
-                       column_map=_data_file_name("apdb-afw-map.yaml"),
-                       afw_schemas=afw_schemas)
+            self._makeApdbSchema(column_map=_data_file_name("apdb-afw-map.yaml"),
+                                 afw_schemas=afw_schemas)
 
     def test_getAfwSchema(self):
         """Test for getAfwSchema method.
@@ -179,14 +248,8 @@ class ApdbSchemaTestCase(unittest.TestCase):
         Schema is defined in YAML files, some checks here depend on that
         configuration and will need to be updated when configuration changes.
         """
-        engine = create_engine('sqlite://')
-
         # create standard (baseline) schema, but use afw column map
-        schema = ApdbSchema(engine=engine,
-                            dia_object_index="baseline",
-                            dia_object_nightly=False,
-                            schema_file=_data_file_name("apdb-schema.yaml"),
-                            column_map=_data_file_name("apdb-afw-map.yaml"))
+        schema = self._makeApdbSchema(column_map=_data_file_name("apdb-afw-map.yaml"))
         schema.makeSchema()
 
         afw_schema, col_map = schema.getAfwSchema("DiaObject")
@@ -220,17 +283,11 @@ class ApdbSchemaTestCase(unittest.TestCase):
         Same as above but use non-default afw schemas, this adds few extra
         columns to the table schema
         """
-        engine = create_engine('sqlite://')
-
         # create standard (baseline) schema, but use afw column map
         afw_schemas = dict(DiaObject=make_minimal_dia_object_schema(),
-                           DiaSource=make_minimal_dia_source_schema())
-        schema = ApdbSchema(engine=engine,
-                            dia_object_index="baseline",
-                            dia_object_nightly=False,
-                            schema_file=_data_file_name("apdb-schema.yaml"),
-                            column_map=_data_file_name("apdb-afw-map.yaml"),
-                            afw_schemas=afw_schemas)
+                           DiaSource=_DIA_SRC_SCHEMA)
+        schema = self._makeApdbSchema(column_map=_data_file_name("apdb-afw-map.yaml"),
+                                      afw_schemas=afw_schemas)
         schema.makeSchema()
 
         afw_schema, col_map = schema.getAfwSchema("DiaObject")
@@ -258,20 +315,50 @@ class ApdbSchemaTestCase(unittest.TestCase):
         # one extra column exists for some reason for DiaObect in afw schema
         self.assertEqual(afw_schema.getFieldCount(), 5)
 
+    def test_getAfwSchemaRepeated(self):
+        """Test for repeated calls to getAfwSchema method.
+
+        Results are cached internally, check that repeated calls and calls
+        with different column subsets return correct results.
+        """
+        schema = self._makeApdbSchema(column_map=_data_file_name("apdb-afw-map.yaml"))
+        schema.makeSchema()
+
+        afw_schema1, col_map1 = schema.getAfwSchema("DiaObject")
+        # modifying returned objects should not affect later calls
+        col_map1.clear()
+        afw_schema1.addField("extraField", type='L')
+        afw_schema1.getAliasMap().set("extraAlias", "id")
+        afw_schema2, col_map2 = schema.getAfwSchema("DiaObject")
+        self.assertEqual(len(col_map2), 92)
+        self.assertEqual(afw_schema2.getFieldCount(), 81)
+        self.assertNotIn("extraAlias", afw_schema2.getAliasMap())
+
+        # column order does not matter
+        afw_schema, col_map = schema.getAfwSchema("DiaObject", ["ra", "decl", "diaObjectId"])
+        self.assertEqual(len(col_map), 3)
+        afw_schema, col_map = schema.getAfwSchema("DiaObject", ["diaObjectId", "decl", "ra"])
+        self.assertEqual(len(col_map), 3)
+
+        # different subset gives different schema
+        afw_schema, col_map = schema.getAfwSchema("DiaObject",
+                                                  ["diaObjectId", "ra", "decl", "ra_decl_Cov"])
+        self.assertEqual(len(col_map), 4)
+        self.assertEqual(afw_schema.getFieldCount(), 5)
+
+        # empty list of columns means all columns
+        afw_schema, col_map = schema.getAfwSchema("DiaObject", [])
+        self.assertEqual(len(col_map), 92)
+        self.assertEqual(afw_schema.getFieldCount(), 81)
+
     def test_getAfwColumns(self):
         """Test for getAfwColumns method.
 
         Schema is defined in YAML files, some checks here depend on that
         configuration and will need to be updated when configuration changes.
         """
-        engine = create_engine('sqlite://')
-
         # create standard (baseline) schema, but use afw column map
-        schema = ApdbSchema(engine=engine,
-                            dia_object_index="baseline",
-                            dia_object_nightly=False,
-                            schema_file=_data_file_name("apdb-schema.yaml"),
-                            column_map=_data_file_name("apdb-afw-map.yaml"))
+        schema = self._makeApdbSchema(column_map=_data_file_name("apdb-afw-map.yaml"))
         schema.makeSchema()
 
         col_map = schema.getAfwColumns("DiaObject")